@@ -2,12 +2,16 @@
 Django settings for broker_portal project.
 """
 
-from pathlib import Path
 import os
-from decouple import config, Csv
+from decouple import Config, Csv, RepositoryEmpty, RepositoryEnv
 
-# Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+# Build paths inside the project like this: os.path.join(BASE_DIR, 'subdir').
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Environment snapshot: the project .env (if any) is parsed into memory once
+# here and every config() call below reads from that snapshot (os.environ wins).
+ENV_FILE = os.path.join(BASE_DIR, '.env')
+config = Config(RepositoryEnv(ENV_FILE) if os.path.isfile(ENV_FILE) else RepositoryEmpty())
 
 # SECURITY: Load SECRET_KEY from environment variable
 # Generate a new one with: python -c "from django.core.management.utils import get_random_secret_key; print(get_random_secret_key())"
@@ -55,7 +59,7 @@ ROOT_URLCONF = 'broker_portal.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'core' / 'templates'],
+        'DIRS': [os.path.join(BASE_DIR, 'core', 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -71,24 +75,6 @@ TEMPLATES = [
 WSGI_APPLICATION = 'broker_portal.wsgi.application'
 
 
-# Database
-# PostgreSQL Configuration (production-ready, efficient, scalable)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('DB_NAME', default='broker_portal'),
-        'USER': config('DB_USER', default='postgres'),
-        'PASSWORD': config('DB_PASSWORD', default=''),
-        'HOST': config('DB_HOST', default='localhost'),
-        'PORT': config('DB_PORT', default='5432'),
-        'OPTIONS': {
-            'connect_timeout': 10,
-        },
-        # Connection pooling for better performance
-        'CONN_MAX_AGE': 600 if not DEBUG else 0,  # Reuse connections in production
-    }
-}
-
 # Database
 # PostgreSQL Configuration (production-ready, efficient, scalable)
 # PostgreSQL only - SQLite fallback removed after successful data migration
@@ -103,8 +89,9 @@ DATABASES = {
         'OPTIONS': {
             'connect_timeout': 10,
         },
-        # Connection pooling for better performance
-        'CONN_MAX_AGE': 600 if not DEBUG else 0,  # Reuse connections in production
+        # Persistent connections for better performance (psycopg pool mode needs Django 5.1+)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0 if DEBUG else 600, cast=int),  # Reuse connections in production
+        'CONN_HEALTH_CHECKS': True,  # Validate reused connections instead of failing the request
     }
 }
 
@@ -157,7 +144,7 @@ LOGOUT_REDIRECT_URL = '/login/'
 # SECURITY SETTINGS - Comprehensive Security Configuration
 # ============================================================================
 
-# SECURITY: HTTPS Settings (enable in production)
+# SECURITY: Production-only settings (HTTPS + database SSL), applied in one place
 if not DEBUG:
     SECURE_SSL_REDIRECT = True  # Redirect all HTTP to HTTPS
     SESSION_COOKIE_SECURE = True  # Only send session cookies over HTTPS
@@ -167,6 +154,11 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
+    # PostgreSQL SSL configuration (connection reuse is set in DATABASES above)
+    ssl_mode = config('DB_SSLMODE', default='prefer')
+    if ssl_mode != 'prefer':
+        DATABASES['default']['OPTIONS']['sslmode'] = ssl_mode  # prefer, require, verify-full
+
 # SECURITY: Session Security
 SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript access to session cookies
 SESSION_COOKIE_SAMESITE = 'Lax'  # CSRF protection
@@ -192,20 +184,10 @@ SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'  # Control referrer i
 RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
 RATE_LIMIT_REQUESTS = config('RATE_LIMIT_REQUESTS', default=100, cast=int)  # Requests per window
 RATE_LIMIT_WINDOW = config('RATE_LIMIT_WINDOW', default=60, cast=int)  # Window in seconds
+RATE_LIMIT_SLIDING = config('RATE_LIMIT_SLIDING', default=False, cast=bool)  # Sliding instead of fixed window
 LOGIN_RATE_LIMIT_REQUESTS = config('LOGIN_RATE_LIMIT_REQUESTS', default=5, cast=int)  # Login attempts
 LOGIN_RATE_LIMIT_WINDOW = config('LOGIN_RATE_LIMIT_WINDOW', default=300, cast=int)  # 5 minutes
 
-# SECURITY: Database Security
-# Use connection pooling and SSL in production
-if not DEBUG:
-    # Connection pooling is already set in DATABASES config above
-    # PostgreSQL SSL configuration for production
-    ssl_mode = config('DB_SSLMODE', default='prefer')
-    if ssl_mode != 'prefer':
-        DATABASES['default']['OPTIONS'].update({
-            'sslmode': ssl_mode,  # prefer, require, verify-full
-        })
-
 # SECURITY: File Upload Security
 FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
@@ -219,8 +201,15 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@example.com')
+# Send OTP emails from a background thread so SMTP latency stays off the signup request.
+# send_otp_email() then always reports success: SMTP failures are only logged and
+# signup never shows its "failed to send" error - users must request a new code.
+OTP_EMAIL_ASYNC = config('OTP_EMAIL_ASYNC', default=False, cast=bool)
 
 # SECURITY: Logging Configuration
+# Override LOG_FILE to keep the security log outside the project tree (e.g. /var/log)
+LOG_FILE = config('LOG_FILE', default=os.path.join(BASE_DIR, 'security.log'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -233,9 +222,10 @@ LOGGING = {
     'handlers': {
         'file': {
             'level': 'WARNING',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'security.log',
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': LOG_FILE,
             'formatter': 'verbose',
+            'delay': True,  # Open the log file on first write, not at startup
         },
         'console': {
             'level': 'INFO',
@@ -0,0 +1,32 @@
+"""
+Django settings for running the test suite.
+
+Usage:
+    python manage.py test --settings=broker_portal.test_settings --parallel auto
+
+Tests run against an in-memory SQLite database that is built straight from
+the models, so no PostgreSQL server is needed and test workers don't share
+state. The schema is rebuilt on every run (fast in memory), so --keepdb is
+not needed.
+
+Install requirements-test.txt first: --parallel needs tblib to report
+failing tests from its worker processes.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+# Build tables directly from the current models instead of replaying the
+# migration history for every test database (and every parallel worker)
+MIGRATION_MODULES = {app.rsplit('.', 1)[-1]: None for app in INSTALLED_APPS}  # noqa: F405
+
+# Tests exercise views without tripping the per-IP limiter
+RATE_LIMIT_ENABLED = False
+
+# Test users never log in, so skip the deliberately slow PBKDF2 hashing
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -1,50 +1,66 @@
 """
 Django admin configuration
 """
+from decimal import Decimal
 from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.forms import ModelForm
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
 from .models import Client, Exchange, ClientExchangeAccount, ClientExchangeReportConfig, Transaction, Settlement
 
 
+# Static admin HTML fragments, built once instead of per changelist row
+_PNL_POSITIVE_OPEN = mark_safe('<span style="color: green;">')
+_PNL_NEGATIVE_OPEN = mark_safe('<span style="color: red;">')
+_SPAN_CLOSE = mark_safe('</span>')
+_STATUS_FLAT = mark_safe('<span style="color: green; font-weight: bold;">✓ Trading Flat (PnL = 0)</span>')
+_STATUS_ACTION_REQUIRED = mark_safe('<span style="color: orange; font-weight: bold;">⚠ Action Required</span>')
+
+
+def _fmt(n):
+    """Format an integer money value with thousands separators (single formatting path for the admin)"""
+    return format(n, ',')
+
+
+class ReportConfigForm(ModelForm):
+    """Report config form validating Company % + My Own % against My Total %"""
+    class Meta:
+        model = ClientExchangeReportConfig
+        fields = ('friend_percentage', 'my_own_percentage')
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance and self.instance.client_exchange:
+            friend_pct = cleaned_data.get('friend_percentage', 0) or Decimal('0')
+            my_own_pct = cleaned_data.get('my_own_percentage', 0) or Decimal('0')
+            my_total = self.instance.client_exchange.my_percentage
+            
+            # Convert to Decimal for precise comparison
+            if isinstance(friend_pct, (int, float)):
+                friend_pct = Decimal(str(friend_pct))
+            if isinstance(my_own_pct, (int, float)):
+                my_own_pct = Decimal(str(my_own_pct))
+            if isinstance(my_total, (int, float)):
+                my_total = Decimal(str(my_total))
+            
+            # Validate with epsilon for floating point comparison
+            epsilon = Decimal('0.01')
+            sum_percentages = friend_pct + my_own_pct
+            if abs(sum_percentages - my_total) >= epsilon:
+                raise ValidationError(
+                    f"Company % ({friend_pct:.2f}) + My Own % ({my_own_pct:.2f}) = {sum_percentages:.2f}, "
+                    f"but My Total % = {my_total:.2f}. They must be equal."
+                )
+        return cleaned_data
+
+
 class ClientExchangeReportConfigInline(admin.StackedInline):
     """Inline admin for report config"""
     model = ClientExchangeReportConfig
+    form = ReportConfigForm
     extra = 0
     fields = ('friend_percentage', 'my_own_percentage')
-    
-    def get_formset(self, request, obj=None, **kwargs):
-        formset = super().get_formset(request, obj, **kwargs)
-        
-        class ReportConfigForm(formset.form):
-            def clean(self):
-                cleaned_data = super().clean()
-                if self.instance and self.instance.client_exchange:
-                    from decimal import Decimal
-                    friend_pct = cleaned_data.get('friend_percentage', 0) or Decimal('0')
-                    my_own_pct = cleaned_data.get('my_own_percentage', 0) or Decimal('0')
-                    my_total = self.instance.client_exchange.my_percentage
-                    
-                    # Convert to Decimal for precise comparison
-                    if isinstance(friend_pct, (int, float)):
-                        friend_pct = Decimal(str(friend_pct))
-                    if isinstance(my_own_pct, (int, float)):
-                        my_own_pct = Decimal(str(my_own_pct))
-                    if isinstance(my_total, (int, float)):
-                        my_total = Decimal(str(my_total))
-                    
-                    # Validate with epsilon for floating point comparison
-                    epsilon = Decimal('0.01')
-                    sum_percentages = friend_pct + my_own_pct
-                    if abs(sum_percentages - my_total) >= epsilon:
-                        raise ValidationError(
-                            f"Company % ({friend_pct:.2f}) + My Own % ({my_own_pct:.2f}) = {sum_percentages:.2f}, "
-                            f"but My Total % = {my_total:.2f}. They must be equal."
-                        )
-                return cleaned_data
-        
-        formset.form = ReportConfigForm
-        return formset
 
 
 @admin.register(Client)
@@ -60,58 +76,74 @@ class ExchangeAdmin(admin.ModelAdmin):
     search_fields = ['name', 'code']
 
 
+# ClientExchangeAccountAdmin layout, defined once at module level
+_ACCOUNT_LIST_DISPLAY = ('client', 'exchange', 'funding', 'exchange_balance', 'loss_share_percentage', 'profit_share_percentage', 'computed_pnl', 'computed_share')
+_ACCOUNT_READONLY_FIELDS = ('computed_pnl', 'computed_share', 'settlement_status_derived', 'remaining_settlement', 'created_at', 'updated_at')
+_ACCOUNT_FIELDSETS = (
+    ('Account Information', {
+        'fields': ('client', 'exchange', 'my_percentage', 'loss_share_percentage', 'profit_share_percentage')
+    }),
+    ('Money Values (BIGINT)', {
+        'fields': ('funding', 'exchange_balance'),
+        'description': 'ONLY real money values stored here. All other values are DERIVED.'
+    }),
+    ('Computed Values (Read-Only)', {
+        'fields': ('computed_pnl', 'computed_share', 'remaining_settlement', 'settlement_status_derived'),
+        'description': 'These values are computed from funding and exchange_balance, never stored. Settlement status: PnL = 0 → Trading flat, Remaining = 0 → Settlement complete.'
+    }),
+    ('Timestamps', {
+        'fields': ('created_at', 'updated_at'),
+        'classes': ('collapse',)
+    }),
+)
+
+
 @admin.register(ClientExchangeAccount)
 class ClientExchangeAccountAdmin(admin.ModelAdmin):
-    list_display = ['client', 'exchange', 'funding', 'exchange_balance', 'loss_share_percentage', 'profit_share_percentage', 'computed_pnl', 'computed_share']
+    list_display = _ACCOUNT_LIST_DISPLAY
     list_filter = ['exchange', 'created_at']
     search_fields = ['client__name', 'exchange__name']
-    readonly_fields = ['computed_pnl', 'computed_share', 'settlement_status_derived', 'remaining_settlement', 'created_at', 'updated_at']
+    list_select_related = ['client', 'exchange']
+    autocomplete_fields = ['client', 'exchange']
+    readonly_fields = _ACCOUNT_READONLY_FIELDS
+    show_full_result_count = False
     inlines = [ClientExchangeReportConfigInline]
     
-    fieldsets = (
-        ('Account Information', {
-            'fields': ('client', 'exchange', 'my_percentage', 'loss_share_percentage', 'profit_share_percentage')
-        }),
-        ('Money Values (BIGINT)', {
-            'fields': ('funding', 'exchange_balance'),
-            'description': 'ONLY real money values stored here. All other values are DERIVED.'
-        }),
-        ('Computed Values (Read-Only)', {
-            'fields': ('computed_pnl', 'computed_share', 'remaining_settlement', 'settlement_status_derived'),
-            'description': 'These values are computed from funding and exchange_balance, never stored. Settlement status: PnL = 0 → Trading flat, Remaining = 0 → Settlement complete.'
-        }),
-        ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
-            'classes': ('collapse',)
-        }),
-    )
+    fieldsets = _ACCOUNT_FIELDSETS
+    
+    def get_queryset(self, request):
+        # Client_PnL computed by the database for every row
+        return ClientExchangeAccount.with_client_pnl(super().get_queryset(request))
     
     def computed_pnl(self, obj):
         """Display computed Client PnL"""
-        pnl = obj.compute_client_pnl()
+        pnl = obj.client_pnl
         if pnl == 0:
             return "N.A"
-        color = "green" if pnl > 0 else "red"
-        return f'<span style="color: {color};">{pnl:,}</span>'
+        return format_html(
+            '{}{}{}',
+            _PNL_POSITIVE_OPEN if pnl > 0 else _PNL_NEGATIVE_OPEN,
+            _fmt(pnl),
+            _SPAN_CLOSE,
+        )
     computed_pnl.short_description = "Client PnL (Computed)"
-    computed_pnl.allow_tags = True
     
     def computed_share(self, obj):
         """Display computed My Share"""
-        pnl = obj.compute_client_pnl()
+        pnl = obj.client_pnl
         if pnl == 0:
             return "N.A"
-        share = obj.compute_my_share()
-        return f'{share:,}'
+        share = obj.compute_my_share(pnl)
+        return _fmt(share)
     computed_share.short_description = "My Share (Computed)"
     
     def remaining_settlement(self, obj):
         """Display remaining settlement amount"""
-        remaining = obj.get_remaining_settlement_amount()
-        final_share = obj.compute_my_share()
+        remaining = obj.get_remaining_settlement_amount()['remaining']
+        final_share = obj.compute_my_share(obj.client_pnl)
         if final_share == 0:
             return "N.A (Zero Share)"
-        return f'{remaining:,} / {final_share:,}'
+        return f'{_fmt(remaining)} / {_fmt(final_share)}'
     remaining_settlement.short_description = "Remaining Settlement"
     
     def settlement_status_derived(self, obj):
@@ -122,14 +154,13 @@ class ClientExchangeAccountAdmin(admin.ModelAdmin):
         Rule: if Remaining = 0 → Settlement complete (all share paid)
               else → Action required
         """
-        pnl = obj.compute_client_pnl()
+        pnl = obj.client_pnl
         if pnl == 0:
-            return '<span style="color: green; font-weight: bold;">✓ Trading Flat (PnL = 0)</span>'
+            return _STATUS_FLAT
         else:
-            return '<span style="color: orange; font-weight: bold;">⚠ Action Required</span>'
+            return _STATUS_ACTION_REQUIRED
     settlement_status_derived.short_description = "Settlement Status (Derived)"
     settlement_status_derived.help_text = "Derived from Client_PnL. NOT stored in database."
-    settlement_status_derived.allow_tags = True
 
 
 @admin.register(Settlement)
@@ -137,29 +168,34 @@ class SettlementAdmin(admin.ModelAdmin):
     list_display = ['date', 'client_exchange', 'amount', 'notes']
     list_filter = ['date']
     search_fields = ['client_exchange__client__name', 'client_exchange__exchange__name', 'notes']
+    list_select_related = ['client_exchange__client', 'client_exchange__exchange']
+    autocomplete_fields = ['client_exchange']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'date'
+    show_full_result_count = False
 
 
 @admin.register(ClientExchangeReportConfig)
 class ClientExchangeReportConfigAdmin(admin.ModelAdmin):
     list_display = ['client_exchange', 'friend_percentage', 'my_own_percentage', 'computed_friend_share', 'computed_my_own_share']
     readonly_fields = ['computed_friend_share', 'computed_my_own_share', 'created_at', 'updated_at']
+    list_select_related = ['client_exchange__client', 'client_exchange__exchange']
+    autocomplete_fields = ['client_exchange']
     
     def computed_friend_share(self, obj):
         """Display computed friend share (report only)"""
-        pnl = obj.client_exchange.compute_client_pnl()
+        pnl = obj.client_exchange.client_pnl
         if pnl == 0:
             return "N.A"
-        return f'{obj.compute_friend_share():,}'
+        return _fmt(obj.compute_friend_share(pnl))
     computed_friend_share.short_description = "Friend Share (Report)"
     
     def computed_my_own_share(self, obj):
         """Display computed my own share (report only)"""
-        pnl = obj.client_exchange.compute_client_pnl()
+        pnl = obj.client_exchange.client_pnl
         if pnl == 0:
             return "N.A"
-        return f'{obj.compute_my_own_share():,}'
+        return _fmt(obj.compute_my_own_share(pnl))
     computed_my_own_share.short_description = "My Own Share (Report)"
 
 
@@ -168,5 +204,8 @@ class TransactionAdmin(admin.ModelAdmin):
     list_display = ['date', 'client_exchange', 'type', 'amount', 'exchange_balance_after']
     list_filter = ['type', 'date']
     search_fields = ['client_exchange__client__name', 'client_exchange__exchange__name', 'notes']
+    list_select_related = ['client_exchange__client', 'client_exchange__exchange']
+    autocomplete_fields = ['client_exchange']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'date'
+    show_full_result_count = False
@@ -4,11 +4,20 @@ Forms for the Profit-Loss-Share-Settlement System
 from django import forms
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 from decimal import Decimal
 from .models import Client, Exchange, ClientExchangeAccount, ClientExchangeReportConfig, Transaction, EmailOTP
 
 User = get_user_model()
 
+# Keep the signup form in sync with the user model's username column
+USERNAME_MAX_LENGTH = User._meta.get_field('username').max_length
+
+# Balance-update choices: every transaction type except manual funding (funding has its own form)
+BALANCE_UPDATE_TRANSACTION_TYPES = tuple(
+    choice for choice in Transaction.TRANSACTION_TYPES if choice[0] != 'FUNDING_MANUAL'
+)
+
 
 class ClientForm(forms.ModelForm):
     """Form for creating/editing clients"""
@@ -72,28 +81,16 @@ class ClientExchangeLinkForm(forms.ModelForm):
     
     def clean(self):
         cleaned_data = super().clean()
-        my_percentage = cleaned_data.get('my_percentage', 0)
-        friend_percentage = cleaned_data.get('friend_percentage', 0) or Decimal('0')
-        my_own_percentage = cleaned_data.get('my_own_percentage', 0) or Decimal('0')
-        
-        # Convert to Decimal for precise comparison and ensure they're stored as Decimal
-        if isinstance(my_percentage, (int, float)):
-            my_percentage = Decimal(str(my_percentage))
-        elif not isinstance(my_percentage, Decimal):
-            my_percentage = Decimal(str(my_percentage))
-        cleaned_data['my_percentage'] = my_percentage
-        
-        if isinstance(friend_percentage, (int, float)):
-            friend_percentage = Decimal(str(friend_percentage))
-        elif not isinstance(friend_percentage, Decimal):
-            friend_percentage = Decimal(str(friend_percentage))
-        cleaned_data['friend_percentage'] = friend_percentage
         
-        if isinstance(my_own_percentage, (int, float)):
-            my_own_percentage = Decimal(str(my_own_percentage))
-        elif not isinstance(my_own_percentage, Decimal):
-            my_own_percentage = Decimal(str(my_own_percentage))
-        cleaned_data['my_own_percentage'] = my_own_percentage
+        # Normalize each percentage to Decimal once; save() relies on these values
+        for field in ('my_percentage', 'friend_percentage', 'my_own_percentage'):
+            value = cleaned_data.get(field) or Decimal('0')
+            if not isinstance(value, Decimal):
+                value = Decimal(str(value))
+            cleaned_data[field] = value
+        my_percentage = cleaned_data['my_percentage']
+        friend_percentage = cleaned_data['friend_percentage']
+        my_own_percentage = cleaned_data['my_own_percentage']
         
         # Validation Rule: Friend % + My Own % = My Total % (with epsilon for floating point comparison)
         epsilon = Decimal('0.01')
@@ -111,35 +108,25 @@ class ClientExchangeLinkForm(forms.ModelForm):
         
         # Save report config if percentages provided
         if commit:
-            # Get values from cleaned_data (should already be Decimal from clean() method)
-            friend_pct_raw = self.cleaned_data.get('friend_percentage')
-            my_own_pct_raw = self.cleaned_data.get('my_own_percentage')
-            
-            # Ensure values are Decimal, not int or None
-            if friend_pct_raw is None:
-                friend_pct = Decimal('0')
-            elif isinstance(friend_pct_raw, Decimal):
-                friend_pct = friend_pct_raw
-            else:
-                # Convert string/int/float to Decimal, preserving decimal precision
-                friend_pct = Decimal(str(friend_pct_raw))
-                
-            if my_own_pct_raw is None:
-                my_own_pct = Decimal('0')
-            elif isinstance(my_own_pct_raw, Decimal):
-                my_own_pct = my_own_pct_raw
-            else:
-                # Convert string/int/float to Decimal, preserving decimal precision
-                my_own_pct = Decimal(str(my_own_pct_raw))
+            # Already normalized to Decimal by clean()
+            friend_pct = self.cleaned_data['friend_percentage']
+            my_own_pct = self.cleaned_data['my_own_percentage']
             
             if friend_pct > 0 or my_own_pct > 0:
-                ClientExchangeReportConfig.objects.update_or_create(
-                    client_exchange=instance,
-                    defaults={
-                        'friend_percentage': friend_pct,
-                        'my_own_percentage': my_own_pct,
-                    }
+                # Single-statement upsert (INSERT ... ON CONFLICT DO UPDATE)
+                ClientExchangeReportConfig.objects.bulk_create(
+                    [ClientExchangeReportConfig(
+                        client_exchange=instance,
+                        friend_percentage=friend_pct,
+                        my_own_percentage=my_own_pct,
+                    )],
+                    update_conflicts=True,
+                    unique_fields=['client_exchange'],
+                    update_fields=['friend_percentage', 'my_own_percentage', 'updated_at'],
                 )
+            else:
+                # Both cleared - drop any previously saved split instead of leaving it stale
+                ClientExchangeReportConfig.objects.filter(client_exchange=instance).delete()
         
         return instance
 
@@ -172,7 +159,7 @@ class ExchangeBalanceUpdateForm(forms.Form):
         help_text="New exchange balance after trade/fee"
     )
     transaction_type = forms.ChoiceField(
-        choices=Transaction.TRANSACTION_TYPES[1:],  # Exclude FUNDING
+        choices=BALANCE_UPDATE_TRANSACTION_TYPES,
         widget=forms.Select(attrs={'class': 'field-input'}),
         initial='TRADE'
     )
@@ -206,15 +193,17 @@ class RecordPaymentForm(forms.Form):
     def __init__(self, *args, **kwargs):
         self.account = kwargs.pop('account', None)
         super().__init__(*args, **kwargs)
+        # Client_PnL computed once per form and reused for the widget limit and validation
+        self.client_pnl = self.account.compute_client_pnl() if self.account else None
         if self.account:
-            max_amount = abs(self.account.compute_client_pnl())
+            max_amount = abs(self.client_pnl)
             self.fields['paid_amount'].widget.attrs['max'] = max_amount
             self.fields['paid_amount'].help_text = f"Amount paid (max: {max_amount:,})"
     
     def clean_paid_amount(self):
         paid_amount = self.cleaned_data.get('paid_amount')
         if self.account:
-            client_pnl = self.account.compute_client_pnl()
+            client_pnl = self.client_pnl
             max_amount = abs(client_pnl)
             
             if paid_amount > max_amount:
@@ -234,16 +223,16 @@ class SignupForm(forms.Form):
     """Form for user registration with username, email, and password."""
     username = forms.CharField(
         min_length=4,
-        max_length=30,
+        max_length=USERNAME_MAX_LENGTH,
         required=True,
         widget=forms.TextInput(attrs={
             'class': 'field-input',
             'placeholder': 'Enter your username',
             'autofocus': True,
             'minlength': '4',
-            'maxlength': '30'
+            'maxlength': str(USERNAME_MAX_LENGTH)
         }),
-        help_text="Required. 4-30 characters. You can use any characters."
+        help_text=f"Required. 4-{USERNAME_MAX_LENGTH} characters. You can use any characters."
     )
     email = forms.EmailField(
         required=True,
@@ -269,20 +258,30 @@ class SignupForm(forms.Form):
         # Validate length
         if len(username) < 4:
             raise ValidationError("Username must be at least 4 characters long.")
-        if len(username) > 30:
-            raise ValidationError("Username must be at most 30 characters long.")
-        
-        # Check for duplicate
-        if User.objects.filter(username=username).exists():
-            raise ValidationError("A user with this username already exists.")
+        if len(username) > USERNAME_MAX_LENGTH:
+            raise ValidationError(f"Username must be at most {USERNAME_MAX_LENGTH} characters long.")
         
         return username
     
-    def clean_email(self):
-        email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
-            raise ValidationError("A user with this email already exists.")
-        return email
+    def clean(self):
+        cleaned_data = super().clean()
+        username = cleaned_data.get('username')
+        email = cleaned_data.get('email')
+        
+        # Check for duplicate username/email with a single query
+        if username or email:
+            lookup = Q()
+            if username:
+                lookup |= Q(username=username)
+            if email:
+                lookup |= Q(email=email)
+            for existing_username, existing_email in User.objects.filter(lookup).values_list('username', 'email'):
+                if username and existing_username == username and 'username' not in self.errors:
+                    self.add_error('username', "A user with this username already exists.")
+                if email and existing_email == email and 'email' not in self.errors:
+                    self.add_error('email', "A user with this email already exists.")
+        
+        return cleaned_data
 
 
 class OTPVerificationForm(forms.Form):
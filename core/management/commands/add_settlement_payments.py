@@ -160,7 +160,7 @@ class Command(BaseCommand):
                     # Note: We need to temporarily set locked values for the helper method
                     # Since we're calculating based on original state, we'll compute manually
                     if initial_final_share > 0 and original_locked_pnl is not None:
-                        masked_capital = int((payment_amount * abs(original_locked_pnl)) / initial_final_share)
+                        masked_capital = (payment_amount * abs(original_locked_pnl)) // initial_final_share
                     else:
                         masked_capital = 0
                     
@@ -17,27 +17,35 @@ class RateLimitMiddleware(MiddlewareMixin):
     Limits requests per IP address within a time window.
     """
     
+    # Paths that are never rate limited (admin, assets, health checks)
+    SKIP_PREFIXES = ('/admin/', '/static/', '/media/', '/favicon.ico', '/healthz')
+    
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        # Settings don't change at runtime; read them once per process
+        self.enabled = getattr(settings, 'RATE_LIMIT_ENABLED', True)
+        self.max_requests = getattr(settings, 'RATE_LIMIT_REQUESTS', 100)
+        self.window = getattr(settings, 'RATE_LIMIT_WINDOW', 60)
+        self.sliding = getattr(settings, 'RATE_LIMIT_SLIDING', False)
+    
     def process_request(self, request):
-        # Skip rate limiting for admin and static files
-        if request.path.startswith('/admin/') or request.path.startswith('/static/'):
+        # Skip rate limiting for admin, static files and health checks
+        if request.path.startswith(self.SKIP_PREFIXES):
             return None
         
         # Check if rate limiting is enabled
-        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        if not self.enabled:
             return None
         
         # Get client IP address
         ip_address = self.get_client_ip(request)
         
-        # Rate limit key
-        rate_limit_key = f'rate_limit:{ip_address}'
-        
-        # Get current request count
-        requests = cache.get(rate_limit_key, 0)
-        max_requests = getattr(settings, 'RATE_LIMIT_REQUESTS', 100)
-        window = getattr(settings, 'RATE_LIMIT_WINDOW', 60)
+        if self.sliding:
+            requests = self.count_sliding_window(ip_address, self.window)
+        else:
+            requests = self.count_fixed_window(ip_address, self.window)
         
-        if requests >= max_requests:
+        if requests > self.max_requests:
             logger.warning(f'Rate limit exceeded for IP: {ip_address}')
             return HttpResponse(
                 'Too many requests. Please try again later.',
@@ -45,11 +53,52 @@ class RateLimitMiddleware(MiddlewareMixin):
                 content_type='text/plain'
             )
         
-        # Increment request count
-        cache.set(rate_limit_key, requests + 1, window)
-        
         return None
     
+    def count_fixed_window(self, ip_address, window):
+        """Count this request in a fixed window that expires `window` seconds after its first request."""
+        rate_limit_key = f'rate_limit:{ip_address}'
+        
+        # add() only sets the expiry on the window's first request; incr()
+        # keeps it, so later requests never push the window's end back
+        if cache.add(rate_limit_key, 1, window):
+            return 1
+        try:
+            return cache.incr(rate_limit_key)
+        except ValueError:
+            # Window expired between add() and incr() - start a new one
+            cache.add(rate_limit_key, 1, window)
+            return 1
+    
+    def count_sliding_window(self, ip_address, window):
+        """
+        Count this request in a sliding window of `window` seconds.
+        
+        Approximates a true sliding log with two fixed-window counters: the
+        previous window's count is weighted by how much of it still overlaps
+        the sliding window. Avoids the 2x burst a fixed window allows at its
+        boundary while keeping O(1) cache storage per IP.
+        """
+        now = time.time()
+        current_window = int(now // window)
+        current_key = f'rate_limit:{ip_address}:{current_window}'
+        previous_key = f'rate_limit:{ip_address}:{current_window - 1}'
+        
+        # Keep each bucket for two windows so it can serve as the previous one
+        if cache.add(current_key, 1, window * 2):
+            current = 1
+        else:
+            try:
+                current = cache.incr(current_key)
+            except ValueError:
+                # Bucket expired between add() and incr() - start it again
+                cache.add(current_key, 1, window * 2)
+                current = 1
+        previous = cache.get(previous_key, 0)
+        
+        overlap = 1 - (now % window) / window
+        return int(previous * overlap) + current
+    
     def get_client_ip(self, request):
         """Get client IP address from request headers."""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -63,11 +112,12 @@ class RateLimitMiddleware(MiddlewareMixin):
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """
     Add additional security headers to all responses.
+    Headers already set by a view are left untouched.
     """
     
-    def process_response(self, request, response):
+    SECURITY_HEADERS = {
         # Content Security Policy
-        response['Content-Security-Policy'] = (
+        'Content-Security-Policy': (
             "default-src 'self'; "
             "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
             "style-src 'self' 'unsafe-inline'; "
@@ -75,22 +125,15 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
             "font-src 'self' data:; "
             "connect-src 'self'; "
             "frame-ancestors 'none';"
-        )
-        
-        # X-Content-Type-Options
-        response['X-Content-Type-Options'] = 'nosniff'
-        
-        # X-XSS-Protection
-        response['X-XSS-Protection'] = '1; mode=block'
-        
-        # Referrer Policy
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
+        ),
+        'X-Content-Type-Options': 'nosniff',
+        'X-XSS-Protection': '1; mode=block',
+        'Referrer-Policy': 'strict-origin-when-cross-origin',
         # Permissions Policy
-        response['Permissions-Policy'] = (
-            'geolocation=(), microphone=(), camera=()'
-        )
-        
+        'Permissions-Policy': 'geolocation=(), microphone=(), camera=()',
+    }
+    
+    def process_response(self, request, response):
+        for header, value in self.SECURITY_HEADERS.items():
+            response.setdefault(header, value)
         return response
-
-
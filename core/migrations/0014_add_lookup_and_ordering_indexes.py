@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-16 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_add_version_name_to_exchange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['name'], name='core_client_name_76d9ae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['client_exchange', 'date'], name='core_settle_client__96b8cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='core_transa_date_2d33ba_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_add_lookup_and_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='auth_user_email_ece7f7_idx'),
+        ),
+    ]
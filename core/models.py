@@ -6,6 +6,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 
 class CustomUser(AbstractUser):
@@ -28,6 +29,10 @@ class CustomUser(AbstractUser):
         db_table = 'auth_user'
         verbose_name = 'user'
         verbose_name_plural = 'users'
+        indexes = [
+            # Signup checks for an existing account by email
+            models.Index(fields=['email']),
+        ]
 
     def __str__(self):
         return self.username
@@ -51,6 +56,22 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class ClientExchangeAccountManager(models.Manager):
+    """Join client and exchange - __str__ and the default ordering use both."""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('client', 'exchange')
+
+
+class ClientExchangeRelatedManager(models.Manager):
+    """Join the account's client and exchange for models keyed by client_exchange."""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'client_exchange__client', 'client_exchange__exchange'
+        )
+
+
 class Client(TimeStampedModel):
     """
     Client entity - trades on exchange, receives FULL profit, pays FULL loss.
@@ -70,6 +91,9 @@ class Client(TimeStampedModel):
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name']),
+        ]
     
     def __str__(self):
         return self.name
@@ -237,6 +261,8 @@ class ClientExchangeAccount(TimeStampedModel):
         help_text="Funding amount when share was locked. Used to detect funding changes that should reset cycle."
     )
     
+    objects = ClientExchangeAccountManager()
+    
     class Meta:
         unique_together = [['client', 'exchange']]
         ordering = ['client__name', 'exchange__name']
@@ -253,6 +279,44 @@ class ClientExchangeAccount(TimeStampedModel):
         """
         return self.exchange_balance - self.funding
     
+    @cached_property
+    def client_pnl(self):
+        """
+        Client PnL memoized on this instance (read-only display paths such as admin rows).
+        
+        Snapshot of compute_client_pnl() taken on first access and dropped on
+        save()/refresh_from_db(); code that mutates funding/exchange_balance
+        in memory must keep calling compute_client_pnl().
+        """
+        return self.compute_client_pnl()
+    
+    @classmethod
+    def with_client_pnl(cls, queryset=None):
+        """
+        Annotate Client_PnL (exchange_balance - funding) onto every row in SQL.
+        
+        The annotation pre-populates the client_pnl property, so list views can
+        read row.client_pnl without a per-row Python computation.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.annotate(
+            client_pnl=models.ExpressionWrapper(
+                models.F('exchange_balance') - models.F('funding'),
+                output_field=models.BigIntegerField(),
+            )
+        )
+    
+    def save(self, *args, **kwargs):
+        """Drop the memoized client_pnl so it is recomputed from the saved balances."""
+        self.__dict__.pop('client_pnl', None)
+        super().save(*args, **kwargs)
+    
+    def refresh_from_db(self, *args, **kwargs):
+        """Drop the memoized client_pnl so it is recomputed from the reloaded balances."""
+        self.__dict__.pop('client_pnl', None)
+        super().refresh_from_db(*args, **kwargs)
+    
     def get_share_percentage(self, client_pnl=None):
         """
         BASE LOGIC: Get appropriate share percentage based on PnL direction.
@@ -283,40 +347,47 @@ class ClientExchangeAccount(TimeStampedModel):
         
         return share_pct
     
-    def compute_masked_capital(self, share_payment):
+    def compute_masked_capital(self, share_payment, initial_final_share=None):
         """
         Calculate masked capital from share payment.
         
-        Formula: MaskedCapital = (SharePayment × abs(LockedInitialPnL)) / LockedInitialFinalShare
+        Formula: MaskedCapital = floor((SharePayment × abs(LockedInitialPnL)) / LockedInitialFinalShare)
         
         This ensures SharePayment maps back to PnL linearly, not exponentially.
         
         Args:
             share_payment: Share payment amount (integer)
+            initial_final_share: Optional 'initial_final_share' from a
+                get_remaining_settlement_amount() result the caller already has.
+                If None, it is looked up (lock check + settlements SUM query).
         
         Returns:
             int: Masked capital amount
         """
-        settlement_info = self.get_remaining_settlement_amount()
-        initial_final_share = settlement_info['initial_final_share']
+        if initial_final_share is None:
+            initial_final_share = self.get_remaining_settlement_amount()['initial_final_share']
         locked_initial_pnl = self.locked_initial_pnl
         
         if initial_final_share == 0 or locked_initial_pnl is None:
             return 0
         
-        return int((share_payment * abs(locked_initial_pnl)) / initial_final_share)
+        return (share_payment * abs(locked_initial_pnl)) // initial_final_share
     
-    def compute_my_share(self):
+    def compute_my_share(self, client_pnl=None):
         """
         MASKED SHARE SETTLEMENT SYSTEM - PARTNER SHARE FORMULA
         
         Uses floor() rounding (round down) for final share.
         Separate percentages for loss and profit.
         
+        Args:
+            client_pnl: Optional PnL value. If None, computes from current balances.
+        
         Returns: BIGINT (always positive, floor rounded)
         """
         import math
-        client_pnl = self.compute_client_pnl()
+        if client_pnl is None:
+            client_pnl = self.compute_client_pnl()
         
         if client_pnl == 0:
             return 0
@@ -410,7 +481,7 @@ class ClientExchangeAccount(TimeStampedModel):
         # If no locked share exists, or PnL cycle changed (sign flip or zero crossing), lock new share
         if self.locked_initial_final_share is None or self.locked_initial_pnl is None:
             # First time - lock the share
-            final_share = self.compute_my_share()
+            final_share = self.compute_my_share(client_pnl)
             if final_share > 0:
                 # Use helper method to get appropriate share percentage
                 share_pct = self.get_share_percentage(client_pnl)
@@ -425,7 +496,7 @@ class ClientExchangeAccount(TimeStampedModel):
             # Check if PnL cycle changed (sign flip)
             if (client_pnl < 0) != (self.locked_initial_pnl < 0):
                 # PnL cycle changed - lock new share
-                final_share = self.compute_my_share()
+                final_share = self.compute_my_share(client_pnl)
                 if final_share > 0:
                     # Use helper method to get appropriate share percentage
                     share_pct = self.get_share_percentage(client_pnl)
@@ -523,10 +594,10 @@ class ClientExchangeAccount(TimeStampedModel):
             initial_final_share = self.locked_initial_final_share
         else:
             # No locked share - check if current share > 0 and should be locked
-            current_share = self.compute_my_share()
+            client_pnl = self.compute_client_pnl()
+            current_share = self.compute_my_share(client_pnl)
             if current_share > 0:
                 # Current share exists but not locked - lock it now
-                client_pnl = self.compute_client_pnl()
                 # Use helper method to get appropriate share percentage
                 share_pct = self.get_share_percentage(client_pnl)
                 
@@ -639,6 +710,8 @@ class ClientExchangeReportConfig(TimeStampedModel):
         help_text="Your own percentage (report only, decimals allowed)"
     )
     
+    objects = ClientExchangeRelatedManager()
+    
     class Meta:
         verbose_name = "Report Configuration"
         verbose_name_plural = "Report Configurations"
@@ -665,21 +738,29 @@ class ClientExchangeReportConfig(TimeStampedModel):
                     f"but My Total % = {my_total:.2f}. They must be equal."
                 )
     
-    def compute_friend_share(self):
+    def compute_friend_share(self, client_pnl=None):
         """
         Friend share formula (report only)
         Friend_Share = ABS(Client_PnL) × friend_percentage / 100
+        
+        Args:
+            client_pnl: Optional PnL value. If None, computes from current balances.
         """
-        client_pnl = abs(self.client_exchange.compute_client_pnl())
-        return int((client_pnl * float(self.friend_percentage)) / 100)
+        if client_pnl is None:
+            client_pnl = self.client_exchange.compute_client_pnl()
+        return int((abs(client_pnl) * float(self.friend_percentage)) / 100)
     
-    def compute_my_own_share(self):
+    def compute_my_own_share(self, client_pnl=None):
         """
         My own share formula (report only)
         My_Own_Share = ABS(Client_PnL) × my_own_percentage / 100
+        
+        Args:
+            client_pnl: Optional PnL value. If None, computes from current balances.
         """
-        client_pnl = abs(self.client_exchange.compute_client_pnl())
-        return int((client_pnl * float(self.my_own_percentage)) / 100)
+        if client_pnl is None:
+            client_pnl = self.client_exchange.compute_client_pnl()
+        return int((abs(client_pnl) * float(self.my_own_percentage)) / 100)
 
 
 class Settlement(TimeStampedModel):
@@ -701,8 +782,14 @@ class Settlement(TimeStampedModel):
     date = models.DateTimeField(help_text="Date when payment was made")
     notes = models.TextField(blank=True, null=True, help_text="Optional notes about this settlement")
     
+    objects = ClientExchangeRelatedManager()
+    
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            # Current-cycle lookups: settlements for an account since cycle_start_date
+            models.Index(fields=['client_exchange', 'date']),
+        ]
     
     def __str__(self):
         return f"Settlement: {self.client_exchange} - {self.amount} - {self.date.strftime('%Y-%m-%d')}"
@@ -774,10 +861,14 @@ class Transaction(TimeStampedModel):
     
     notes = models.TextField(blank=True, null=True)
     
+    objects = ClientExchangeRelatedManager()
+    
     class Meta:
         ordering = ['created_at', 'sequence_no']
         indexes = [
             models.Index(fields=['client_exchange', 'created_at', 'sequence_no']),
+            # Date-range filters in transaction lists and reports
+            models.Index(fields=['date']),
         ]
     
     def __str__(self):
@@ -1,24 +1,94 @@
+from functools import lru_cache
+
 from django import template
-from decimal import Decimal
-import builtins
+from django.utils.safestring import mark_safe
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
 
 register = template.Library()
 
+# Shared prefixes and fallbacks for the INR filters. Formatted numbers are
+# only digits, commas, '.', '-' and '₹', so results are marked safe to spare
+# the template engine an escape pass per cell.
+_INR = "₹"
+_NEG_INR = "-₹"
+_ZERO = mark_safe("0")
+_ZERO_INR = mark_safe("₹0")
+_ZERO_INR_DECIMAL = mark_safe("₹0.00")
 
-@register.filter
-def abs(value):
+
+def _group_slices(num_digits):
+    """
+    Slices that cut a num_digits-long digit string into Indian groups:
+    the last three digits, then pairs - 7 digits -> [0:2] [2:4] [4:7].
+    """
+    bounds = []
+    end = num_digits
+    width = 3
+    while end > 0:
+        start = max(0, end - width)
+        bounds.append(slice(start, end))
+        end = start
+        width = 2
+    return tuple(reversed(bounds))
+
+
+# Group layouts for every 64-bit length, built once at import
+_GROUP_SLICES = {num_digits: _group_slices(num_digits) for num_digits in range(1, 21)}
+
+
+@lru_cache(maxsize=4096)
+def _format_indian_int(num_abs):
+    """
+    Group a non-negative integer with Indian commas: 1000000 -> "10,00,000".
+    
+    Cached - dashboards render the same totals and balances over and over.
+    Sign and currency symbol are added by the callers so every caller shares
+    the same cache entries. Returns a SafeString.
+    """
+    num_str = str(num_abs)
+    slices = _GROUP_SLICES.get(len(num_str)) or _group_slices(len(num_str))
+    return mark_safe(','.join([num_str[group] for group in slices]))
+
+
+@register.filter(name='abs')
+def abs_filter(value):
     """
     Return the absolute value of a number.
     Works with Decimal, int, float, and None values.
+    Numbers keep their type; numeric strings are parsed as Decimal.
     """
     if value is None:
         return None
-    try:
-        if isinstance(value, Decimal):
-            return builtins.abs(value)
-        return builtins.abs(float(value))
-    except (TypeError, ValueError):
+    if isinstance(value, str):
+        try:
+            value = Decimal(value)
+        except InvalidOperation:
+            return value
+    return abs(value)
+
+
+def _to_int(value):
+    """
+    Round any numeric value to an int for display.
+    
+    CRITICAL: Force integer conversion FIRST (handles floats, strings, etc.)
+    This prevents issues like "10.0" being formatted as "10,0.0"
+    Raises ValueError/TypeError for non-numeric input.
+    """
+    # BIGINT columns arrive as int - nothing to convert (bool falls through)
+    if type(value) is int:
         return value
+    # CRITICAL: Handle Decimal objects from database without a float round trip;
+    # half-even matches round() on the float path
+    if isinstance(value, Decimal):
+        return int(value.to_integral_value(rounding=ROUND_HALF_EVEN))
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    # Use round() then int() to properly handle floats
+    return int(round(float(value)))
 
 
 @register.filter
@@ -33,52 +103,23 @@ def indian_number_format(value):
     """
     if value is None:
         return ""
+    # Empty aggregates and unset amounts are the most common cells
+    if value == 0:
+        return _ZERO
     
     try:
-        # CRITICAL: Handle Decimal objects from database
-        if isinstance(value, Decimal):
-            value = float(value)
-        
-        # CRITICAL: Force integer conversion FIRST (handles floats, strings, etc.)
-        # This prevents issues like "10.0" being formatted as "10,0.0"
-        # Use round() then int() to properly handle floats
-        num = int(round(float(value)))
-        
-        # Handle zero
-        if num == 0:
-            return "0"
-        
-        # Handle negative numbers
-        is_negative = num < 0
-        num_abs = abs(num)
-        
-        # Convert to string (already integer, guaranteed no decimals)
-        # Use format to ensure no decimal point
-        num_str = f"{num_abs:.0f}" if isinstance(num_abs, float) else str(int(num_abs))
-        
-        # Get last 3 digits
-        last_three = num_str[-3:]
-        # Get remaining digits
-        other_digits = num_str[:-3]
-        
-        # Add commas every 2 digits for remaining numbers (Indian format)
-        if other_digits:
-            # Reverse, add commas every 2 digits, reverse back
-            reversed_other = other_digits[::-1]
-            formatted_other = ','.join(
-                reversed_other[i:i+2] for i in range(0, len(reversed_other), 2)
-            )[::-1]
-            result = formatted_other + ',' + last_three
-        else:
-            result = last_three
-        
-        # Add negative sign if original was negative
-        if is_negative:
-            result = '-' + result
-        
-        return result
+        num = _to_int(value)
     except (ValueError, TypeError):
         return str(value)
+    
+    # Fewer than four digits: nothing to group
+    if -1000 < num < 1000:
+        return mark_safe(str(num))
+    
+    # Add negative sign if original was negative
+    if num < 0:
+        return mark_safe('-' + _format_indian_int(-num))
+    return _format_indian_int(num)
 
 
 @register.filter
@@ -88,55 +129,23 @@ def currency_inr(value):
     Use this for ALL display values (tables, cards, labels, reports, etc.).
     Example: 1000000 -> "₹10,00,000"
     
-    CRITICAL: Always converts to integer before formatting to avoid decimal issues.
-    This prevents "10.0" from being formatted as "₹10,0.0"
+    Same rounding and grouping as indian_number_format, plus the ₹ symbol.
     """
-    if value is None:
-        return "₹0"
+    # None, 0, 0.0, Decimal('0') and '' all display as ₹0
+    if not value:
+        return _ZERO_INR
     
     try:
-        # CRITICAL: Handle Decimal objects from database
-        if isinstance(value, Decimal):
-            value = float(value)
-        
-        # CRITICAL: Force integer conversion FIRST (handles floats, strings, etc.)
-        # This prevents issues like "10.0" being formatted as "₹10,0.0"
-        # Use round() then int() to properly handle floats
-        num = int(round(float(value)))
-        
-        # Handle zero
-        if num == 0:
-            return "₹0"
-        
-        # Handle negative numbers
-        is_negative = num < 0
-        num_abs = abs(num)
-        
-        # CRITICAL: Convert to string AFTER integer conversion (guaranteed no decimals)
-        # This ensures we never format a float string like "10.0"
-        # Use format to ensure no decimal point
-        num_str = f"{num_abs:.0f}" if isinstance(num_abs, float) else str(int(num_abs))
-        
-        # Get last 3 digits
-        last_three = num_str[-3:]
-        # Get remaining digits
-        other_digits = num_str[:-3]
-        
-        # Add commas every 2 digits for remaining numbers (Indian format)
-        if other_digits:
-            # Reverse, add commas every 2 digits, reverse back
-            reversed_other = other_digits[::-1]
-            formatted_other = ','.join(
-                reversed_other[i:i+2] for i in range(0, len(reversed_other), 2)
-            )[::-1]
-            formatted = formatted_other + ',' + last_three
-        else:
-            formatted = last_three
-        
-        # Add currency symbol and negative sign
-        return ("-₹" if is_negative else "₹") + formatted
+        num = _to_int(value)
     except (ValueError, TypeError):
-        return "₹0"
+        return _ZERO_INR
+    
+    # Fewer than four digits: nothing to group
+    if -1000 < num < 1000:
+        return mark_safe(_INR + str(num) if num >= 0 else _NEG_INR + str(-num))
+    
+    # Add currency symbol and negative sign
+    return mark_safe((_NEG_INR if num < 0 else _INR) + _format_indian_int(abs(num)))
 
 
 @register.filter
@@ -146,22 +155,17 @@ def currency_inr_decimal(value):
     Use this for profit/loss values that need decimal precision.
     Example: 8.1 -> "₹8.10", 1234.56 -> "₹1,234.56"
     """
-    if value is None:
-        return "₹0.00"
+    # None, 0, 0.0, Decimal('0') and '' all display as ₹0.00
+    if not value:
+        return _ZERO_INR_DECIMAL
     
     try:
-        # Handle Decimal objects from database
-        if isinstance(value, Decimal):
-            num = float(value)
-        else:
-            num = float(value)
-        
-        # Round to 2 decimal places
-        num = round(num, 2)
+        # Round to 2 decimal places (Decimal, int, float and numeric strings alike)
+        num = round(float(value), 2)
         
         # Handle zero
         if num == 0:
-            return "₹0.00"
+            return _ZERO_INR_DECIMAL
         
         # Handle negative numbers
         is_negative = num < 0
@@ -172,22 +176,7 @@ def currency_inr_decimal(value):
         decimal_part = num_abs - integer_part
         
         # Format integer part with Indian number system commas
-        integer_str = str(integer_part)
-        
-        if len(integer_str) > 3:
-            # Get last 3 digits
-            last_three = integer_str[-3:]
-            # Get remaining digits
-            other_digits = integer_str[:-3]
-            
-            # Add commas every 2 digits for remaining numbers (Indian format)
-            reversed_other = other_digits[::-1]
-            formatted_other = ','.join(
-                reversed_other[i:i+2] for i in range(0, len(reversed_other), 2)
-            )[::-1]
-            formatted_integer = formatted_other + ',' + last_three
-        else:
-            formatted_integer = integer_str
+        formatted_integer = _format_indian_int(integer_part)
         
         # Format decimal part (always 2 digits)
         decimal_str = f"{decimal_part:.2f}".split('.')[1]
@@ -196,6 +185,22 @@ def currency_inr_decimal(value):
         formatted = formatted_integer + '.' + decimal_str
         
         # Add currency symbol and negative sign
-        return ("-₹" if is_negative else "₹") + formatted
+        return mark_safe((_NEG_INR if is_negative else _INR) + formatted)
     except (ValueError, TypeError):
-        return "₹0.00"
+        return _ZERO_INR_DECIMAL
+
+
+@register.simple_tag
+def currency_columns(rows, *fields):
+    """
+    Format currency columns for a whole table in one call.
+    Returns (row, [formatted values]) pairs in field order, so a table with
+    many rows doesn't pay filter dispatch for every cell.
+    Usage:
+        {% currency_columns transactions "amount" "funding_after" as rows %}
+        {% for transaction, amounts in rows %}{{ amounts.0 }}{% endfor %}
+    """
+    return [
+        (row, [currency_inr(getattr(row, field)) for field in fields])
+        for row in rows
+    ]
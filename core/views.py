@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 import json
@@ -26,6 +27,9 @@ import string
 
 logger = logging.getLogger('core.security')
 
+# Small dedicated pool: OTP mail is bursty but low volume
+_otp_email_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='otp-email')
+
 from .models import (
     Client,
     Exchange,
@@ -60,6 +64,27 @@ def calculate_share_split(total_share, my_share_pct, friend_share_pct):
 
 
 # Helper functions to eliminate duplicate logic
+def sum_turnover(trade_qs):
+    """
+    Turnover = Σ(|ExchangeBalanceAfter − ExchangeBalanceBefore|) over TRADE transactions.
+    
+    Summed in the database so report pages don't load every trade row.
+    """
+    return trade_qs.aggregate(
+        total=Sum(Abs(F("exchange_balance_after") - F("exchange_balance_before")))
+    )["total"] or 0
+
+
+def turnover_by_client(trade_qs):
+    """Turnover per client name, in a single grouped query."""
+    return {
+        row["client_exchange__client__name"]: row["turnover"] or 0
+        for row in trade_qs.order_by().values("client_exchange__client__name").annotate(
+            turnover=Sum(Abs(F("exchange_balance_after") - F("exchange_balance_before")))
+        )
+    }
+
+
 def calculate_display_remaining(client_pnl, remaining_amount):
     """
     Calculate display remaining amount with correct sign based on Client_PnL direction.
@@ -431,7 +456,12 @@ def generate_otp():
 
 
 def send_otp_email(email, username, otp_code):
-    """Send OTP code to user's email."""
+    """
+    Send OTP code to user's email.
+    
+    Returns True on success. With OTP_EMAIL_ASYNC the email is only queued,
+    so this always returns True and delivery failures are only logged.
+    """
     subject = 'Verify Your Email - Transaction Hub'
     message = f"""
 Hello {username},
@@ -447,6 +477,15 @@ If you didn't request this code, please ignore this email.
 Best regards,
 Transaction Hub Team
 """
+    if settings.OTP_EMAIL_ASYNC:
+        # Delivery failures are only logged; the user can request a new code
+        _otp_email_executor.submit(_deliver_otp_email, subject, message, email)
+        return True
+    return _deliver_otp_email(subject, message, email)
+
+
+def _deliver_otp_email(subject, message, email):
+    """Send the OTP email over the configured backend. Returns True on success."""
     try:
         send_mail(
             subject,
@@ -526,6 +565,7 @@ def verify_otp_view(request):
         return redirect('signup')
     
     if request.method == "POST":
+        from django.db import IntegrityError
         form = OTPVerificationForm(request.POST, email=email)
         if form.is_valid():
             otp_code = form.cleaned_data['otp_code']
@@ -596,6 +636,14 @@ Transaction Hub Team
                     logger.info(f'New user account created: {username} ({email})')
                     
                     return redirect("dashboard")
+                except IntegrityError:
+                    # Username/email taken between signup and verification
+                    logger.warning(f'Signup conflict for {username} ({email}): account already exists')
+                    return render(request, "core/auth/verify_otp.html", {
+                        "form": form,
+                        "email": email,
+                        "error": "A user with this username or email already exists. Please sign up again."
+                    })
                 except Exception as e:
                     logger.error(f'Failed to create user account: {str(e)}')
                     return render(request, "core/auth/verify_otp.html", {
@@ -704,10 +752,7 @@ def dashboard(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     your_profit = 0  # Computed from accounts, not transactions
     # Company profit removed - no longer applicable
     company_profit = Decimal(0)
@@ -813,20 +858,22 @@ def dashboard(request):
 
 
     # Get all accounts for the current user
-    all_accounts = ClientExchangeAccount.objects.filter(client__user=request.user).select_related("client", "exchange")
+    all_accounts = ClientExchangeAccount.with_client_pnl(
+        ClientExchangeAccount.objects.filter(client__user=request.user).select_related("client", "exchange")
+    )
     
-    # Calculate totals from accounts
+    # Calculate totals from accounts (Client_PnL comes annotated from the database)
     total_funding = sum(account.funding for account in all_accounts)
     total_exchange_balance = sum(account.exchange_balance for account in all_accounts)
-    total_client_pnl = sum(account.compute_client_pnl() for account in all_accounts)
+    total_client_pnl = sum(account.client_pnl for account in all_accounts)
     
     # FINANCIAL INTERPRETATION: Apply sign to Total My Share
     # - If client_pnl < 0 (LOSS): Client owes you → share is POSITIVE
     # - If client_pnl > 0 (PROFIT): You owe client → share is NEGATIVE
     total_my_share = Decimal(0)
     for account in all_accounts:
-        client_pnl = account.compute_client_pnl()
-        share_amount = account.compute_my_share()
+        client_pnl = account.client_pnl
+        share_amount = account.compute_my_share(client_pnl)
         if client_pnl < 0:
             # LOSS CASE: Client owes you → share is POSITIVE
             total_my_share += share_amount
@@ -2223,10 +2270,7 @@ def report_overview(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # 📘 YOUR TOTAL PROFIT Calculation (CORRECTNESS LOGIC)
     # 
@@ -2457,12 +2501,13 @@ def report_overview(request):
         exchange_balance_before__isnull=True
     ).exclude(
         exchange_balance_after__isnull=True
+    ).order_by().values("date").annotate(
+        turnover_sum=Sum(Abs(F("exchange_balance_after") - F("exchange_balance_before")))
     )
     
-    for tx in daily_trades:
-        tx_date = tx.date
-        turnover_amount = abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        daily_data[tx_date]["turnover"] += float(turnover_amount)
+    for item in daily_trades:
+        tx_date = item['date']
+        daily_data[tx_date]["turnover"] += float(item["turnover_sum"] or 0)
     
     # Daily profit/loss from RECORD_PAYMENT transactions (CORRECTNESS LOGIC)
     daily_payments = base_qs.filter(
@@ -2576,10 +2621,7 @@ def report_overview(request):
         ).exclude(
             exchange_balance_after__isnull=True
         )
-        month_turnover_val = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in month_trade_qs
-        ) or 0
+        month_turnover_val = sum_turnover(month_trade_qs)
         
         monthly_profit.insert(0, float(month_profit_val))
         monthly_loss.insert(0, float(month_loss_val))
@@ -2625,10 +2667,7 @@ def report_overview(request):
         ).exclude(
             exchange_balance_after__isnull=True
         )
-        week_turnover_val = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in week_trade_qs
-        ) or 0
+        week_turnover_val = sum_turnover(week_trade_qs)
         
         weekly_profit.insert(0, float(week_profit_val))
         weekly_loss.insert(0, float(week_loss_val))
@@ -2767,10 +2806,7 @@ def time_travel_report(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     your_profit = payment_qs.aggregate(total=Sum("amount"))["total"] or Decimal(0)
@@ -3455,10 +3491,7 @@ def report_daily(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     payment_qs = qs.filter(type='RECORD_PAYMENT')
@@ -3588,15 +3621,7 @@ def report_daily(request):
     )
     
     # Turnover from TRADE transactions (exchange balance movement) per client
-    client_trade_qs = trade_qs.values("client_exchange__client__name")
-    client_turnover_map = {}
-    for client_name in client_trade_qs.values_list("client_exchange__client__name", flat=True).distinct():
-        client_trades = trade_qs.filter(client_exchange__client__name=client_name)
-        client_turnover = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in client_trades
-        ) or 0
-        client_turnover_map[client_name] = client_turnover
+    client_turnover_map = turnover_by_client(trade_qs)
     
     # Combine profit/loss and turnover data
     client_data = []
@@ -3671,10 +3696,7 @@ def report_weekly(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     payment_qs = qs.filter(type='RECORD_PAYMENT')
@@ -3791,10 +3813,7 @@ def report_weekly(request):
         ).exclude(
             exchange_balance_after__isnull=True
         )
-        day_turnover = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in day_trade_qs
-        ) or 0
+        day_turnover = sum_turnover(day_trade_qs)
         
         daily_profit.append(float(day_profit))
         daily_loss.append(float(day_loss))
@@ -3883,10 +3902,7 @@ def report_monthly(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     payment_qs = qs.filter(type='RECORD_PAYMENT')
@@ -4005,10 +4021,7 @@ def report_monthly(request):
         ).exclude(
             exchange_balance_after__isnull=True
         )
-        week_turnover = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in week_trade_qs
-        ) or 0
+        week_turnover = sum_turnover(week_trade_qs)
         
         weekly_profit.append(float(week_profit))
         weekly_loss.append(float(week_loss))
@@ -4048,15 +4061,7 @@ def report_monthly(request):
     )
     
     # Turnover from TRADE transactions (exchange balance movement) per client
-    client_trade_qs = trade_qs.values("client_exchange__client__name")
-    client_turnover_map = {}
-    for client_name in client_trade_qs.values_list("client_exchange__client__name", flat=True).distinct():
-        client_trades = trade_qs.filter(client_exchange__client__name=client_name)
-        client_turnover = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in client_trades
-        ) or 0
-        client_turnover_map[client_name] = client_turnover
+    client_turnover_map = turnover_by_client(trade_qs)
     
     # Combine profit and turnover data
     client_data = []
@@ -4136,10 +4141,7 @@ def report_custom(request):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     payment_qs = qs.filter(type='RECORD_PAYMENT')
@@ -4332,10 +4334,7 @@ def report_client(request, client_pk):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     your_profit = payment_qs.aggregate(total=Sum("amount"))["total"] or Decimal(0)
@@ -4772,7 +4771,7 @@ def record_payment(request, account_id):
                     # Lock the account row to prevent concurrent modifications
                     account = (
                         ClientExchangeAccount.objects
-                        .select_for_update()
+                        .select_for_update(of=('self',))
                         .get(pk=account_id, client__user=request.user)
                     )
                     
@@ -4823,7 +4822,7 @@ def record_payment(request, account_id):
                         return redirect(reverse("exchange_account_detail", args=[account.pk]))
                     
                     # 5. Compute masked capital
-                    masked_capital = account.compute_masked_capital(paid_amount)
+                    masked_capital = account.compute_masked_capital(paid_amount, initial_final_share)
                     if masked_capital == 0:
                         raise ValidationError(
                             "Cannot calculate masked capital. Initial final share is zero."
@@ -5112,10 +5111,7 @@ def report_exchange(request, exchange_pk):
         exchange_balance_after__isnull=True
     )
     # Calculate turnover as sum of absolute exchange balance movements from trades
-    total_turnover = sum(
-        abs(tx.exchange_balance_after - tx.exchange_balance_before)
-        for tx in trade_qs
-    ) or 0
+    total_turnover = sum_turnover(trade_qs)
     
     # Your Total Profit = Sum(RECORD_PAYMENT.amount) - signed sum
     payment_qs = qs.filter(type='RECORD_PAYMENT')
@@ -5166,15 +5162,7 @@ def report_exchange(request, exchange_pk):
     )
     
     # Turnover from TRADE transactions (exchange balance movement) per client
-    client_trade_qs = trade_qs.values("client_exchange__client__name")
-    client_turnover_map = {}
-    for client_name in client_trade_qs.values_list("client_exchange__client__name", flat=True).distinct():
-        client_trades = trade_qs.filter(client_exchange__client__name=client_name)
-        client_turnover = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in client_trades
-        ) or 0
-        client_turnover_map[client_name] = client_turnover
+    client_turnover_map = turnover_by_client(trade_qs)
     
     # Combine profit and turnover data
     client_data = []
@@ -5472,10 +5460,7 @@ def client_balance(request, client_pk):
         ).exclude(
             exchange_balance_after__isnull=True
         )
-        total_turnover = sum(
-            abs(tx.exchange_balance_after - tx.exchange_balance_before)
-            for tx in account_trades
-        ) or 0
+        total_turnover = sum_turnover(account_trades)
         
         # Profit/loss calculated from account balances
         client_pnl = client_exchange.compute_client_pnl()